@@ -0,0 +1,122 @@
+import asyncio
+import math
+import time
+from typing import Dict, Tuple
+
+from fastapi.responses import JSONResponse
+
+class AdmissionRejected(Exception):
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+class AdmissionController:
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queue: int,
+        queue_timeout: float = 30.0,
+        min_retry_after: int = 1
+    ):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.min_retry_after = min_retry_after
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.max_queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.avg_service_time = 0.0
+
+    def retry_after(self) -> int:
+        backlog = (self.queued + 1) / self.max_concurrent
+        return max(self.min_retry_after, math.ceil(backlog * self.avg_service_time))
+
+    def _reject(self, reason: str):
+        self.rejected += 1
+        raise AdmissionRejected(f"{self.name} is overloaded: {reason}", self.retry_after())
+
+    async def acquire(self) -> float:
+        start_time = time.perf_counter()
+
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+        elif self.queued >= self.max_queue:
+            self._reject("wait queue is full")
+        else:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject("timed out waiting for a slot")
+            finally:
+                self.queued -= 1
+
+        wait = time.perf_counter() - start_time
+        self.admitted += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.active += 1
+        return time.perf_counter()
+
+    def release(self, start_time: float):
+        service_time = time.perf_counter() - start_time
+        if self.avg_service_time == 0.0:
+            self.avg_service_time = service_time
+        else:
+            self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * service_time
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "total_wait_seconds": self.total_wait,
+            "avg_wait_seconds": self.total_wait / self.admitted if self.admitted else 0.0,
+            "max_wait_seconds": self.max_wait,
+            "avg_service_seconds": self.avg_service_time
+        }
+
+class AdmissionMiddleware:
+    def __init__(self, app, routes: Dict[Tuple[str, str], AdmissionController]):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        controller = None
+        if scope["type"] == "http":
+            controller = self.routes.get((scope["method"], scope["path"]))
+        if controller is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            start_time = await controller.acquire()
+        except AdmissionRejected as e:
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": e.detail},
+                headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release(start_time)
@@ -2,35 +2,467 @@ import cv2
 import numpy as np
 from pathlib import Path
 import os
+import shutil
+import subprocess
+import tempfile
 from deepface import DeepFace
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional, List, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+import asyncio
+import time
 import uuid
 
+from backend.embeddings import EmbeddingMatrix, normalize
+from backend.sightings import SightingIndex
+
+def decode_image(image_data: bytes) -> Optional[np.ndarray]:
+    image_array = np.frombuffer(image_data, np.uint8)
+    return cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+
+def new_stage_costs() -> Dict[str, Dict]:
+    return {
+        stage: {"calls": 0, "seconds": 0.0, "faces": 0}
+        for stage in ("detect", "refine", "embed")
+    }
+
+def add_stage_cost(costs: Optional[Dict], stage: str, seconds: float, faces: int = 0):
+    if costs is None:
+        return
+    costs[stage]["calls"] += 1
+    costs[stage]["seconds"] += seconds
+    costs[stage]["faces"] += faces
+
+def merge_stage_costs(costs: Dict, other: Dict):
+    for stage, cost in other.items():
+        for key, value in cost.items():
+            costs[stage][key] += value
+
+def open_video_writer(path: Path, fps: int, width: int, height: int) -> cv2.VideoWriter:
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    return cv2.VideoWriter(str(path), fourcc, fps, (width, height))
+
+def concat_videos(parts: List[Path], output_path: Path, fps: int, width: int, height: int):
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is not None:
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as part_list:
+            for part in parts:
+                part_list.write(f"file '{part.resolve()}'\n")
+        try:
+            result = subprocess.run(
+                [ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                 "-i", part_list.name, "-c", "copy", str(output_path)],
+                capture_output=True
+            )
+        finally:
+            os.remove(part_list.name)
+        if result.returncode == 0:
+            return
+        print(f"Error concatenating video segments: {result.stderr.decode(errors='replace')}")
+
+    out_video = open_video_writer(output_path, fps, width, height)
+    for part in parts:
+        video_capture = cv2.VideoCapture(str(part))
+        while True:
+            ret, frame = video_capture.read()
+            if not ret:
+                break
+            out_video.write(frame)
+        video_capture.release()
+    out_video.release()
+
+class DetectorCascade:
+    def __init__(
+        self,
+        fast_backend: str = "opencv",
+        fast_scale: float = 0.25,
+        refine_backend: Optional[str] = "retinaface",
+        roi_margin: float = 0.5,
+        min_confidence: float = 0.0
+    ):
+        self.fast_backend = fast_backend
+        self.fast_scale = fast_scale
+        self.refine_backend = refine_backend
+        self.roi_margin = roi_margin
+        self.min_confidence = min_confidence
+
+    def _is_face(self, face: Dict, image: np.ndarray) -> bool:
+        area = face["facial_area"]
+        if area["w"] >= image.shape[1] and area["h"] >= image.shape[0]:
+            return False
+        return face.get("confidence", 1.0) > self.min_confidence
+
+    def locate_faces(self, frame: np.ndarray, costs: Optional[Dict] = None) -> List[Tuple[int, int, int, int]]:
+        start_time = time.perf_counter()
+        small_frame = cv2.resize(frame, (0, 0), fx=self.fast_scale, fy=self.fast_scale)
+        candidates = [
+            face["facial_area"]
+            for face in DeepFace.extract_faces(
+                img_path=small_frame,
+                detector_backend=self.fast_backend,
+                enforce_detection=False
+            )
+            if self._is_face(face, small_frame)
+        ]
+        add_stage_cost(costs, "detect", time.perf_counter() - start_time, len(candidates))
+
+        frame_h, frame_w = frame.shape[:2]
+        boxes = []
+
+        for area in candidates:
+            fx = int(area["x"] / self.fast_scale)
+            fy = int(area["y"] / self.fast_scale)
+            fw = int(area["w"] / self.fast_scale)
+            fh = int(area["h"] / self.fast_scale)
+
+            if self.refine_backend is None:
+                boxes.append((fx, fy, fw, fh))
+                continue
+
+            pad_x = int(fw * self.roi_margin)
+            pad_y = int(fh * self.roi_margin)
+            x0, y0 = max(fx - pad_x, 0), max(fy - pad_y, 0)
+            x1, y1 = min(fx + fw + pad_x, frame_w), min(fy + fh + pad_y, frame_h)
+            roi = frame[y0:y1, x0:x1]
+            if roi.size == 0:
+                continue
+
+            start_time = time.perf_counter()
+            refined = [
+                face["facial_area"]
+                for face in DeepFace.extract_faces(
+                    img_path=roi,
+                    detector_backend=self.refine_backend,
+                    enforce_detection=False
+                )
+                if self._is_face(face, roi)
+            ]
+            add_stage_cost(costs, "refine", time.perf_counter() - start_time, len(refined))
+
+            for face in refined:
+                boxes.append((x0 + face["x"], y0 + face["y"], face["w"], face["h"]))
+
+        return boxes
+
 class FaceDetector:
-    def __init__(self, model_name: str = "Facenet"):
+    def __init__(
+        self,
+        model_name: str = "Facenet",
+        cascade: Optional[DetectorCascade] = None,
+        embedding_dtype: str = "float32",
+        sighting_index: Optional[SightingIndex] = None
+    ):
         self.model_name = model_name
+        self.cascade = cascade
+        self.embedding_dtype = embedding_dtype
+        self.sighting_index = sighting_index
         self.output_dir = Path("outputs")
         self.output_dir.mkdir(exist_ok=True)
+        self._segment_executor = None
+        self._segment_manager = None
+        self._segment_workers = 0
 
-    def get_face_embedding(self, image: np.ndarray) -> Optional[list]:
+    def get_face_embedding(self, image: np.ndarray, detector_backend: str = "opencv") -> Optional[np.ndarray]:
         try:
             result = DeepFace.represent(
                 img_path=image,
                 model_name=self.model_name,
+                detector_backend=detector_backend,
                 enforce_detection=True
             )
-            return result[0]["embedding"]
+            return normalize(result[0]["embedding"])
         except Exception as e:
             print(f"Error getting embedding: {e}")
             return None
 
-    def calculate_similarity(self, embedding1: list, embedding2: list) -> float:
-        embedding1 = np.array(embedding1)
-        embedding2 = np.array(embedding2)
-        cos_sim = np.dot(embedding1, embedding2) / (
-            np.linalg.norm(embedding1) * np.linalg.norm(embedding2)
+    def calculate_similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
+        return float(np.dot(embedding1, embedding2))
+
+    def locate_faces(self, frame: np.ndarray, costs: Optional[Dict] = None) -> List[Tuple[int, int, int, int]]:
+        if self.cascade is not None:
+            return self.cascade.locate_faces(frame, costs)
+
+        start_time = time.perf_counter()
+        small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
+        faces = DeepFace.extract_faces(
+            img_path=small_frame,
+            enforce_detection=False
         )
-        return float(cos_sim)
+        add_stage_cost(costs, "detect", time.perf_counter() - start_time, len(faces))
+
+        return [
+            (
+                int(face["facial_area"]["x"] * 2),
+                int(face["facial_area"]["y"] * 2),
+                int(face["facial_area"]["w"] * 2),
+                int(face["facial_area"]["h"] * 2)
+            )
+            for face in faces
+        ]
+
+    def scan_frame(
+        self,
+        frame: np.ndarray,
+        ref_embedding: np.ndarray,
+        person_name: str,
+        threshold: float,
+        frame_number: int,
+        costs: Optional[Dict] = None,
+        sightings: Optional[List[Dict]] = None
+    ) -> Optional[Dict]:
+        best_match = None
+        best_confidence = 0.0
+        embed_backend = "skip" if self.cascade is not None else "opencv"
+
+        try:
+            for fx, fy, fw, fh in self.locate_faces(frame, costs):
+                face_img = frame[fy:fy+fh, fx:fx+fw]
+                if face_img.size == 0:
+                    continue
+
+                start_time = time.perf_counter()
+                face_embedding = self.get_face_embedding(face_img, embed_backend)
+                add_stage_cost(costs, "embed", time.perf_counter() - start_time, int(face_embedding is not None))
+                if face_embedding is None:
+                    continue
+
+                if sightings is not None:
+                    sightings.append({
+                        "frame_number": frame_number,
+                        "bbox": {"x": fx, "y": fy, "w": fw, "h": fh},
+                        "embedding": face_embedding
+                    })
+
+                similarity = self.calculate_similarity(ref_embedding, face_embedding)
+
+                if similarity > threshold and similarity > best_confidence:
+                    best_confidence = similarity
+                    detected_frame = frame.copy()
+
+                    cv2.rectangle(
+                        detected_frame,
+                        (fx, fy),
+                        (fx+fw, fy+fh),
+                        (0, 255, 0),
+                        3
+                    )
+                    cv2.putText(
+                        detected_frame,
+                        f"{person_name} ({similarity:.2f})",
+                        (fx, fy-10),
+                        cv2.FONT_HERSHEY_SIMPLEX,
+                        0.9,
+                        (0, 255, 0),
+                        2
+                    )
+
+                    best_match = {
+                        "confidence": similarity,
+                        "frame_number": frame_number,
+                        "detected_frame": detected_frame,
+                        "detected_face_img": face_img
+                    }
+        except Exception as e:
+            print(f"Error processing frame {frame_number}: {e}")
+
+        return best_match
+
+    def _save_detected_frame(self, match: Optional[Dict]) -> Optional[str]:
+        if match is None:
+            return None
+        frame_path = self.output_dir / f"frame_{uuid.uuid4()}.jpg"
+        cv2.imwrite(str(frame_path), match["detected_frame"])
+        return str(frame_path)
+
+    def close(self):
+        if self._segment_executor is not None:
+            self._segment_executor.shutdown(wait=True, cancel_futures=True)
+            self._segment_executor = None
+            self._segment_workers = 0
+        if self._segment_manager is not None:
+            self._segment_manager.shutdown()
+            self._segment_manager = None
+
+    def _get_segment_executor(self, segments: int) -> ProcessPoolExecutor:
+        if self._segment_executor is None or self._segment_workers != segments:
+            if self._segment_executor is not None:
+                self._segment_executor.shutdown(wait=False)
+            mp_context = multiprocessing.get_context("spawn")
+            self._segment_executor = ProcessPoolExecutor(max_workers=segments, mp_context=mp_context)
+            self._segment_workers = segments
+            if self._segment_manager is None:
+                self._segment_manager = mp_context.Manager()
+        return self._segment_executor
+
+    async def _detect_in_segments(
+        self,
+        ref_embedding: np.ndarray,
+        video_path: str,
+        person_name: str,
+        threshold: float,
+        frame_skip: int,
+        segments: int,
+        total_frames: int,
+        output_path: Path,
+        fps: int,
+        width: int,
+        height: int,
+        costs: Dict,
+        sightings: Optional[List[Dict]] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Tuple[Optional[Dict], int]:
+        executor = self._get_segment_executor(segments)
+        first_detection = self._segment_manager.Value("i", total_frames + 1)
+        lock = self._segment_manager.Lock()
+
+        segment_length = -(-total_frames // segments)
+        bounds = []
+        for index in range(segments):
+            start_frame = index * segment_length
+            end_frame = None if index == segments - 1 else min(start_frame + segment_length, total_frames)
+            bounds.append((start_frame, end_frame))
+
+        part_paths = [self.output_dir / f"segment_{uuid.uuid4()}.mp4" for _ in bounds]
+        tail_path = self.output_dir / f"segment_{uuid.uuid4()}.mp4"
+
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(
+                executor,
+                _detect_segment,
+                self.model_name,
+                self.cascade,
+                ref_embedding,
+                video_path,
+                person_name,
+                threshold,
+                frame_skip,
+                start_frame,
+                end_frame,
+                first_detection,
+                lock,
+                sightings is not None,
+                str(part_path),
+                fps,
+                width,
+                height
+            )
+            for (start_frame, end_frame), part_path in zip(bounds, part_paths)
+        ]
+
+        try:
+            if progress_callback is not None:
+                done_frames = 0
+                for future in asyncio.as_completed(futures):
+                    try:
+                        done_frames += (await future)["frames_read"]
+                    except Exception:
+                        continue
+                    progress_callback(done_frames, total_frames)
+
+            results = await asyncio.gather(*futures, return_exceptions=True)
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+
+            for result in results:
+                merge_stage_costs(costs, result["stage_costs"])
+                if sightings is not None:
+                    sightings.extend(result["sightings"])
+
+            frames_read = sum(result["frames_read"] for result in results)
+            match_segment = next(
+                (index for index, result in enumerate(results) if result["match"] is not None),
+                None
+            )
+            match = results[match_segment]["match"] if match_segment is not None else None
+
+            await loop.run_in_executor(
+                None,
+                self._assemble_segments,
+                results,
+                match_segment,
+                tail_path,
+                output_path,
+                fps,
+                width,
+                height
+            )
+        finally:
+            for path in part_paths + [tail_path]:
+                if path.exists():
+                    os.remove(path)
+
+        return match, frames_read
+
+    def _assemble_segments(
+        self,
+        results: List[Dict],
+        match_segment: Optional[int],
+        tail_path: Path,
+        output_path: Path,
+        fps: int,
+        width: int,
+        height: int
+    ):
+        keep = len(results) if match_segment is None else match_segment + 1
+        parts = [Path(result["part_path"]) for result in results[:keep]]
+
+        if match_segment is not None:
+            detected_frame = results[match_segment]["match"]["detected_frame"]
+            out_video = open_video_writer(tail_path, fps, width, height)
+            tail_frames = sum(result["frames_read"] for result in results[keep:]) + fps * 3
+            for _ in range(tail_frames):
+                out_video.write(detected_frame)
+            out_video.release()
+            parts.append(tail_path)
+
+        concat_videos(parts, output_path, fps, width, height)
+
+    def _scan_sequential(
+        self,
+        video_capture: cv2.VideoCapture,
+        out_video: cv2.VideoWriter,
+        fps: int,
+        ref_embedding: np.ndarray,
+        person_name: str,
+        threshold: float,
+        frame_skip: int,
+        total_frames: int,
+        costs: Dict,
+        sightings: Optional[List[Dict]],
+        progress_callback: Optional[Callable[[int, int], None]]
+    ) -> Tuple[Optional[Dict], int]:
+        match = None
+        frames_read = 0
+
+        while True:
+            if match is None or sightings is not None:
+                ret, frame = video_capture.read()
+            else:
+                ret = video_capture.grab()
+            if not ret:
+                break
+
+            frames_read += 1
+
+            if frames_read % frame_skip == 0 and (match is None or sightings is not None):
+                found = self.scan_frame(frame, ref_embedding, person_name, threshold, frames_read, costs, sightings)
+                if match is None:
+                    match = found
+
+            out_video.write(match["detected_frame"] if match else frame)
+
+            if progress_callback is not None and frames_read % frame_skip == 0:
+                progress_callback(frames_read, total_frames)
+
+        if match is not None:
+            for _ in range(fps * 3):
+                out_video.write(match["detected_frame"])
+
+        video_capture.release()
+        out_video.release()
+        return match, frames_read
 
     async def detect_in_video(
         self,
@@ -38,9 +470,15 @@ class FaceDetector:
         video_path: str,
         person_name: str,
         threshold: float = 0.7,
-        frame_skip: int = 5
+        frame_skip: int = 5,
+        segments: int = 1,
+        ref_embedding: Optional[np.ndarray] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None
     ) -> Dict:
-        ref_embedding = self.get_face_embedding(reference_image)
+        if ref_embedding is None:
+            ref_embedding = self.get_face_embedding(reference_image)
+        else:
+            ref_embedding = normalize(ref_embedding)
         if ref_embedding is None:
             return {
                 "detected": False,
@@ -48,103 +486,71 @@ class FaceDetector:
             }
 
         video_capture = cv2.VideoCapture(video_path)
-        fps = int(video_capture.get(cv2.CAP_PROP_FPS))
+        frame_rate = video_capture.get(cv2.CAP_PROP_FPS)
+        fps = int(frame_rate)
         width = int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
         total_frames = int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
 
-        output_filename = f"detected_{uuid.uuid4()}.mp4"
-        output_path = self.output_dir / output_filename
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out_video = cv2.VideoWriter(str(output_path), fourcc, fps, (width, height))
+        output_path = self.output_dir / f"detected_{uuid.uuid4()}.mp4"
+        costs = new_stage_costs()
+        sightings = [] if self.sighting_index is not None else None
+        loop = asyncio.get_running_loop()
 
-        detected = False
-        detected_frame = None
-        detected_face_img = None
-        best_confidence = 0.0
-        current_frame = 0
-        detection_frame_num = 0
-
-        while True:
-            ret, frame = video_capture.read()
-            if not ret:
-                break
-
-            current_frame += 1
-
-            if current_frame % frame_skip == 0 and not detected:
-                small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
-
-                try:
-                    faces = DeepFace.extract_faces(
-                        img_path=small_frame,
-                        enforce_detection=False
-                    )
+        if segments > 1 and total_frames > segments:
+            video_capture.release()
+            match, frames_read = await self._detect_in_segments(
+                ref_embedding,
+                video_path,
+                person_name,
+                threshold,
+                frame_skip,
+                segments,
+                total_frames,
+                output_path,
+                fps,
+                width,
+                height,
+                costs,
+                sightings,
+                progress_callback
+            )
+        else:
+            if progress_callback is not None:
+                scan_progress = lambda done, total: loop.call_soon_threadsafe(progress_callback, done, total)
+            else:
+                scan_progress = None
 
-                    for face in faces:
-                        fx = int(face["facial_area"]["x"] * 2)
-                        fy = int(face["facial_area"]["y"] * 2)
-                        fw = int(face["facial_area"]["w"] * 2)
-                        fh = int(face["facial_area"]["h"] * 2)
-
-                        face_img = frame[fy:fy+fh, fx:fx+fw]
-                        if face_img.size == 0:
-                            continue
-
-                        face_embedding = self.get_face_embedding(face_img)
-                        if face_embedding is None:
-                            continue
-
-                        similarity = self.calculate_similarity(ref_embedding, face_embedding)
-
-                        if similarity > threshold and similarity > best_confidence:
-                            best_confidence = similarity
-                            detected = True
-                            detected_face_img = face_img
-                            detected_frame = frame.copy()
-                            detection_frame_num = current_frame
-
-                            cv2.rectangle(
-                                detected_frame,
-                                (fx, fy),
-                                (fx+fw, fy+fh),
-                                (0, 255, 0),
-                                3
-                            )
-                            cv2.putText(
-                                detected_frame,
-                                f"{person_name} ({similarity:.2f})",
-                                (fx, fy-10),
-                                cv2.FONT_HERSHEY_SIMPLEX,
-                                0.9,
-                                (0, 255, 0),
-                                2
-                            )
-                except Exception as e:
-                    print(f"Error processing frame {current_frame}: {e}")
-
-            out_video.write(detected_frame if detected else frame)
-
-        if detected and detected_frame is not None:
-            for _ in range(fps * 3):
-                out_video.write(detected_frame)
+            match, frames_read = await loop.run_in_executor(
+                None,
+                self._scan_sequential,
+                video_capture,
+                open_video_writer(output_path, fps, width, height),
+                fps,
+                ref_embedding,
+                person_name,
+                threshold,
+                frame_skip,
+                total_frames,
+                costs,
+                sightings,
+                scan_progress
+            )
 
-        video_capture.release()
-        out_video.release()
+        if sightings:
+            await loop.run_in_executor(None, self.sighting_index.append, video_path, frame_rate, sightings)
 
-        frame_path = None
-        if detected_face_img is not None:
-            frame_filename = f"frame_{uuid.uuid4()}.jpg"
-            frame_path = self.output_dir / frame_filename
-            cv2.imwrite(str(frame_path), detected_frame)
+        frame_path = await loop.run_in_executor(None, self._save_detected_frame, match)
 
         return {
-            "detected": detected,
-            "confidence": best_confidence,
-            "frame_number": detection_frame_num,
+            "detected": match is not None,
+            "confidence": match["confidence"] if match else 0.0,
+            "frame_number": match["frame_number"] if match else 0,
             "total_frames": total_frames,
-            "frame_path": str(frame_path) if frame_path else None,
-            "output_video_path": str(output_path)
+            "frame_path": frame_path,
+            "output_video_path": str(output_path),
+            "stage_costs": costs,
+            "sightings_indexed": len(sightings) if sightings else 0
         }
 
     async def detect_in_image(
@@ -161,43 +567,17 @@ class FaceDetector:
             }
 
         try:
-            faces = DeepFace.extract_faces(
-                img_path=test_image,
-                enforce_detection=False
-            )
+            faces = self.extract_face_embeddings(test_image)
+            reference = EmbeddingMatrix(ref_embedding.reshape(1, -1), ids=["reference"])
+            matches = self.match_faces(faces, reference, threshold)
 
             best_match = None
-            best_confidence = 0.0
-
-            for face in faces:
-                fx = face["facial_area"]["x"]
-                fy = face["facial_area"]["y"]
-                fw = face["facial_area"]["w"]
-                fh = face["facial_area"]["h"]
-
-                face_img = test_image[fy:fy+fh, fx:fx+fw]
-                if face_img.size == 0:
-                    continue
-
-                face_embedding = self.get_face_embedding(face_img)
-                if face_embedding is None:
-                    continue
-
-                similarity = self.calculate_similarity(ref_embedding, face_embedding)
-
-                if similarity > threshold and similarity > best_confidence:
-                    best_confidence = similarity
-                    best_match = {
-                        "x": fx,
-                        "y": fy,
-                        "w": fw,
-                        "h": fh,
-                        "confidence": similarity
-                    }
+            if matches:
+                best_match = {**matches[0]["face_location"], "confidence": matches[0]["confidence"]}
 
             return {
                 "detected": best_match is not None,
-                "confidence": best_confidence,
+                "confidence": best_match["confidence"] if best_match else 0.0,
                 "face_location": best_match
             }
         except Exception as e:
@@ -205,3 +585,217 @@ class FaceDetector:
                 "detected": False,
                 "error": str(e)
             }
+
+    def extract_face_embeddings(self, image: np.ndarray) -> List[Dict]:
+        faces = DeepFace.extract_faces(
+            img_path=image,
+            enforce_detection=False
+        )
+
+        results = []
+        for face in faces:
+            fx = face["facial_area"]["x"]
+            fy = face["facial_area"]["y"]
+            fw = face["facial_area"]["w"]
+            fh = face["facial_area"]["h"]
+
+            face_img = image[fy:fy+fh, fx:fx+fw]
+            if face_img.size == 0:
+                continue
+
+            face_embedding = self.get_face_embedding(face_img)
+            if face_embedding is None:
+                continue
+
+            results.append({
+                "x": fx,
+                "y": fy,
+                "w": fw,
+                "h": fh,
+                "embedding": face_embedding
+            })
+
+        return results
+
+    def match_faces(
+        self,
+        faces: List[Dict],
+        gallery: EmbeddingMatrix,
+        threshold: float = 0.7
+    ) -> List[Dict]:
+        best_matches = {}
+        if not faces:
+            return []
+
+        scores = gallery.similarities(np.vstack([face["embedding"] for face in faces]))
+
+        for face, similarities in zip(faces, scores):
+            for row in np.flatnonzero(similarities > threshold):
+                person_id = gallery.ids[row]
+                similarity = float(similarities[row])
+
+                if person_id in best_matches and similarity <= best_matches[person_id]["confidence"]:
+                    continue
+
+                best_matches[person_id] = {
+                    "missing_person_id": person_id,
+                    "confidence": similarity,
+                    "face_location": {
+                        "x": face["x"],
+                        "y": face["y"],
+                        "w": face["w"],
+                        "h": face["h"]
+                    }
+                }
+
+        return sorted(best_matches.values(), key=lambda m: m["confidence"], reverse=True)
+
+    def _search_image_batch(
+        self,
+        batch: List[Tuple[str, Optional[np.ndarray]]],
+        gallery: EmbeddingMatrix,
+        threshold: float
+    ) -> List[Dict]:
+        results = []
+
+        for filename, image in batch:
+            if image is None:
+                results.append({
+                    "filename": filename,
+                    "detected": False,
+                    "error": "Invalid image file"
+                })
+                continue
+
+            try:
+                faces = self.extract_face_embeddings(image)
+                matches = self.match_faces(faces, gallery, threshold)
+                results.append({
+                    "filename": filename,
+                    "detected": len(matches) > 0,
+                    "faces": len(faces),
+                    "matches": matches
+                })
+            except Exception as e:
+                results.append({
+                    "filename": filename,
+                    "detected": False,
+                    "error": str(e)
+                })
+
+        return results
+
+    async def detect_in_images(
+        self,
+        gallery: Union[EmbeddingMatrix, Dict[str, np.ndarray]],
+        images: List[Tuple[str, bytes]],
+        threshold: float = 0.7,
+        batch_size: int = 8,
+        max_workers: int = 4
+    ) -> Dict:
+        start_time = time.perf_counter()
+        loop = asyncio.get_running_loop()
+
+        if not isinstance(gallery, EmbeddingMatrix):
+            gallery = EmbeddingMatrix.from_gallery(gallery, self.embedding_dtype)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            decoded = await asyncio.gather(*[
+                loop.run_in_executor(executor, decode_image, image_data)
+                for _, image_data in images
+            ])
+            named_images = [(filename, image) for (filename, _), image in zip(images, decoded)]
+
+            batches = [
+                named_images[i:i + batch_size]
+                for i in range(0, len(named_images), batch_size)
+            ]
+            batch_results = await asyncio.gather(*[
+                loop.run_in_executor(executor, self._search_image_batch, batch, gallery, threshold)
+                for batch in batches
+            ])
+
+        results = [result for batch in batch_results for result in batch]
+        elapsed = time.perf_counter() - start_time
+
+        return {
+            "detected": any(result["detected"] for result in results),
+            "total_images": len(images),
+            "elapsed_seconds": elapsed,
+            "images_per_second": len(images) / elapsed if elapsed > 0 else 0.0,
+            "results": results
+        }
+
+def _detect_segment(
+    model_name: str,
+    cascade: Optional[DetectorCascade],
+    ref_embedding: np.ndarray,
+    video_path: str,
+    person_name: str,
+    threshold: float,
+    frame_skip: int,
+    start_frame: int,
+    end_frame: Optional[int],
+    first_detection,
+    lock,
+    collect_sightings: bool,
+    part_path: str,
+    fps: int,
+    width: int,
+    height: int
+) -> Dict:
+    detector = FaceDetector(model_name, cascade)
+    costs = new_stage_costs()
+    sightings = [] if collect_sightings else None
+
+    video_capture = cv2.VideoCapture(video_path)
+    if start_frame > 0:
+        video_capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    out_video = open_video_writer(Path(part_path), fps, width, height)
+    match = None
+    superseded = False
+    current_frame = start_frame
+
+    while end_frame is None or current_frame < end_frame:
+        sampled = (current_frame + 1) % frame_skip == 0
+        if sampled and not superseded and first_detection.value <= start_frame:
+            superseded = True
+            out_video.release()
+            out_video = None
+            os.remove(part_path)
+            part_path = None
+
+        scanning = collect_sightings or (match is None and not superseded)
+        if scanning:
+            ret, frame = video_capture.read()
+        else:
+            ret = video_capture.grab()
+        if not ret:
+            break
+
+        current_frame += 1
+
+        if scanning and sampled:
+            found = detector.scan_frame(frame, ref_embedding, person_name, threshold, current_frame, costs, sightings)
+            if match is None and found is not None:
+                match = found
+                with lock:
+                    if current_frame < first_detection.value:
+                        first_detection.value = current_frame
+
+        if out_video is not None:
+            out_video.write(match["detected_frame"] if match else frame)
+
+    video_capture.release()
+    if out_video is not None:
+        out_video.release()
+
+    return {
+        "start_frame": start_frame,
+        "frames_read": current_frame - start_frame,
+        "match": match,
+        "part_path": part_path,
+        "stage_costs": costs,
+        "sightings": sightings or []
+    }
@@ -0,0 +1,95 @@
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+
+EMBEDDING_DTYPES = ("float32", "float16", "int8")
+
+def normalize(embedding) -> np.ndarray:
+    embedding = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(embedding, axis=-1, keepdims=True)
+    return embedding / np.where(norm == 0, 1, norm)
+
+class EmbeddingMatrix:
+    def __init__(
+        self,
+        codes: np.ndarray,
+        scales: Optional[np.ndarray] = None,
+        ids: Optional[List[str]] = None
+    ):
+        self.codes = codes
+        self.scales = scales
+        self.ids = list(ids) if ids is not None else [str(i) for i in range(len(codes))]
+
+    @property
+    def dtype(self) -> str:
+        return self.codes.dtype.name
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @classmethod
+    def quantize(
+        cls,
+        embeddings,
+        dtype: str = "float32",
+        ids: Optional[Sequence[str]] = None
+    ) -> "EmbeddingMatrix":
+        if dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+        unit = normalize(np.atleast_2d(embeddings))
+
+        if len(unit) == 0:
+            scales = np.empty(0, dtype=np.float32) if dtype == "int8" else None
+            return cls(np.empty(unit.shape, dtype=dtype), scales, ids)
+
+        if dtype == "int8":
+            scales = np.abs(unit).max(axis=1) / 127
+            scales[scales == 0] = 1
+            codes = np.round(unit / scales[:, None]).astype(np.int8)
+            return cls(codes, scales.astype(np.float32), ids)
+
+        return cls(unit.astype(dtype), None, ids)
+
+    @classmethod
+    def from_gallery(cls, gallery: Dict[str, np.ndarray], dtype: str = "float32") -> "EmbeddingMatrix":
+        if not gallery:
+            return cls(np.empty((0, 0), dtype=dtype), None, [])
+        return cls.quantize(np.vstack(list(gallery.values())), dtype, list(gallery.keys()))
+
+    def row(self, index: int) -> np.ndarray:
+        row = self.codes[index].astype(np.float32)
+        if self.scales is not None:
+            row *= self.scales[index]
+        return row
+
+    def dequantize(self) -> np.ndarray:
+        matrix = self.codes.astype(np.float32)
+        if self.scales is not None:
+            matrix *= self.scales[:, None]
+        return matrix
+
+    def similarities(self, queries, block_rows: int = 1024) -> np.ndarray:
+        queries = normalize(queries)
+        single = queries.ndim == 1
+        queries = np.atleast_2d(queries)
+        scores = np.empty((len(self.codes), len(queries)), dtype=np.float32)
+
+        if len(self.codes) == 0:
+            pass
+        elif self.codes.dtype == np.float32:
+            np.dot(self.codes, queries.T, out=scores)
+        else:
+            block = np.empty((min(block_rows, len(self.codes)), self.codes.shape[1]), dtype=np.float32)
+            for start in range(0, len(self.codes), block_rows):
+                rows = self.codes[start:start + block_rows]
+                block[:len(rows)] = rows
+                np.dot(block[:len(rows)], queries.T, out=scores[start:start + len(rows)])
+
+        if self.scales is not None:
+            scores *= self.scales[:, None]
+
+        return scores[:, 0] if single else scores.T
@@ -0,0 +1,235 @@
+import asyncio
+import json
+import os
+import uuid
+import numpy as np
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+from contextlib import contextmanager
+
+from backend.embeddings import EmbeddingMatrix
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+@contextmanager
+def file_lock(path: Path):
+    with open(path, "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+def write_array(path: Path, array: np.ndarray, tmp_suffix: str):
+    tmp_path = path.with_name(path.name + tmp_suffix)
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.ascontiguousarray(array))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class GalleryState:
+    def __init__(
+        self,
+        version: int = 0,
+        dim: int = 0,
+        ids: Optional[List[str]] = None,
+        names: Optional[List[str]] = None,
+        embeddings: Optional[EmbeddingMatrix] = None
+    ):
+        self.version = version
+        self.dim = dim
+        self.ids = ids or []
+        self.names = names or []
+        self.embeddings = embeddings if embeddings is not None else EmbeddingMatrix(np.empty((0, 0), dtype=np.float32))
+        self.rows = {person_id: row for row, person_id in enumerate(self.ids)}
+
+    def get(self, person_id: str) -> Optional[np.ndarray]:
+        row = self.rows.get(person_id)
+        if row is None:
+            return None
+        return self.embeddings.row(row)
+
+    def get_name(self, person_id: str) -> Optional[str]:
+        row = self.rows.get(person_id)
+        if row is None:
+            return None
+        return self.names[row]
+
+class GallerySnapshot:
+    def __init__(self, root: Path = Path("gallery"), keep_versions: int = 2, dtype: str = "float32"):
+        self.root = Path(root)
+        self.root.mkdir(exist_ok=True)
+        self.keep_versions = keep_versions
+        self.dtype = dtype
+        self.current_file = self.root / "CURRENT"
+        self.lock_file = self.root / "LOCK"
+
+        self.state = GalleryState()
+
+    @property
+    def version(self) -> int:
+        return self.state.version
+
+    @property
+    def ids(self) -> List[str]:
+        return self.state.ids
+
+    @property
+    def names(self) -> List[str]:
+        return self.state.names
+
+    @property
+    def embeddings(self) -> EmbeddingMatrix:
+        return self.state.embeddings
+
+    def _locked(self):
+        return file_lock(self.lock_file)
+
+    def _paths(self, version: int):
+        return (
+            self.root / f"embeddings-v{version}.npy",
+            self.root / f"scales-v{version}.npy",
+            self.root / f"index-v{version}.json"
+        )
+
+    def _read_current_version(self) -> int:
+        try:
+            return int(self.current_file.read_text().strip())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def exists(self) -> bool:
+        return self._read_current_version() > 0
+
+    def refresh(self) -> bool:
+        version = self._read_current_version()
+        if version == 0 or version == self.version:
+            return False
+
+        embeddings_path, scales_path, index_path = self._paths(version)
+        index = json.loads(index_path.read_text())
+
+        if index["ids"]:
+            codes = np.load(embeddings_path, mmap_mode="r")
+            scales = np.load(scales_path, mmap_mode="r") if index["dtype"] == "int8" else None
+        else:
+            codes = np.empty((0, index["dim"]), dtype=index["dtype"])
+            scales = np.empty(0, dtype=np.float32) if index["dtype"] == "int8" else None
+
+        self.state = GalleryState(
+            version,
+            index["dim"],
+            index["ids"],
+            index["names"],
+            EmbeddingMatrix(codes, scales, index["ids"])
+        )
+        return True
+
+    def get(self, person_id: str) -> Optional[np.ndarray]:
+        return self.state.get(person_id)
+
+    def get_name(self, person_id: str) -> Optional[str]:
+        return self.state.get_name(person_id)
+
+    def _publish(self, ids: List[str], names: List[str], embeddings: np.ndarray) -> int:
+        version = self._read_current_version() + 1
+        embeddings_path, scales_path, index_path = self._paths(version)
+        tmp_suffix = f".tmp-{uuid.uuid4().hex}"
+
+        matrix = EmbeddingMatrix.quantize(embeddings, self.dtype, ids)
+        write_array(embeddings_path, matrix.codes, tmp_suffix)
+        if matrix.scales is not None:
+            write_array(scales_path, matrix.scales, tmp_suffix)
+
+        tmp_index = index_path.with_name(index_path.name + tmp_suffix)
+        tmp_index.write_text(json.dumps({
+            "version": version,
+            "dtype": self.dtype,
+            "dim": int(embeddings.shape[1]),
+            "ids": ids,
+            "names": names
+        }))
+        os.replace(tmp_index, index_path)
+
+        tmp_current = self.current_file.with_name(self.current_file.name + tmp_suffix)
+        tmp_current.write_text(str(version))
+        os.replace(tmp_current, self.current_file)
+
+        self._remove_old_versions(version)
+        self.refresh()
+        return version
+
+    def _remove_old_versions(self, version: int):
+        for old_version in range(1, version - self.keep_versions + 1):
+            for path in self._paths(old_version):
+                if path.exists():
+                    path.unlink()
+
+    def _build(self, entries: List[Dict]) -> int:
+        ids = [entry["id"] for entry in entries]
+        names = [entry["name"] for entry in entries]
+        if entries:
+            embeddings = np.vstack([
+                np.asarray(entry["embedding"], dtype=np.float32) for entry in entries
+            ])
+        else:
+            embeddings = np.empty((0, self.state.dim), dtype=np.float32)
+        return self._publish(ids, names, embeddings)
+
+    def build(self, entries: List[Dict]) -> int:
+        with self._locked():
+            return self._build(entries)
+
+    def _build_if_missing(self, entries: List[Dict]):
+        with self._locked():
+            if not self.exists():
+                self._build(entries)
+            self.refresh()
+
+    async def ensure(self, load_entries: Callable[[], Awaitable[List[Dict]]]) -> int:
+        entries = [] if self.exists() else await load_entries()
+        await asyncio.to_thread(self._build_if_missing, entries)
+        return self.version
+
+    def upsert(self, person_id: str, name: str, embedding: list) -> int:
+        with self._locked():
+            self.refresh()
+            state = self.state
+            embedding = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+            ids = list(state.ids)
+            names = list(state.names)
+
+            if len(state.embeddings) > 0:
+                embeddings = state.embeddings.dequantize()
+            else:
+                embeddings = np.empty((0, embedding.shape[1]), dtype=np.float32)
+
+            if person_id in state.rows:
+                row = state.rows[person_id]
+                names[row] = name
+                embeddings[row] = embedding[0]
+            else:
+                ids.append(person_id)
+                names.append(name)
+                embeddings = np.vstack([embeddings, embedding])
+
+            return self._publish(ids, names, embeddings)
+
+    def remove(self, person_id: str) -> int:
+        with self._locked():
+            self.refresh()
+            state = self.state
+            if person_id not in state.rows:
+                return state.version
+
+            row = state.rows[person_id]
+            ids = state.ids[:row] + state.ids[row + 1:]
+            names = state.names[:row] + state.names[row + 1:]
+            embeddings = np.delete(state.embeddings.dequantize(), row, axis=0)
+            return self._publish(ids, names, embeddings)
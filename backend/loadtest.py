@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import cv2
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+STUB_PERSON_ID = "00000000-0000-0000-0000-000000000000"
+
+class StubDetector:
+    def __init__(self, service_time: float):
+        self.service_time = service_time
+
+    def get_face_embedding(self, image: np.ndarray) -> np.ndarray:
+        return np.ones(128, dtype=np.float32) / np.sqrt(128)
+
+    def close(self):
+        pass
+
+    async def detect_in_video(self, **kwargs) -> Dict:
+        await asyncio.to_thread(time.sleep, self.service_time)
+        return {"detected": False, "stage_costs": {}}
+
+    async def detect_in_images(self, gallery, images, **kwargs) -> Dict:
+        await asyncio.to_thread(time.sleep, self.service_time * len(images))
+        return {
+            "detected": False,
+            "total_images": len(images),
+            "elapsed_seconds": self.service_time * len(images),
+            "images_per_second": 1 / self.service_time if self.service_time else 0.0,
+            "results": []
+        }
+
+class StubDatabase:
+    def __init__(self, reference_image_url: str):
+        self.person = {
+            "id": STUB_PERSON_ID,
+            "name": "Load Test",
+            "reference_image_url": reference_image_url,
+            "status": "active"
+        }
+
+    async def get_missing_person_by_id(self, person_id: str) -> Optional[Dict]:
+        return self.person
+
+    async def get_missing_persons(self, status: Optional[str] = None) -> List[Dict]:
+        return [self.person]
+
+def build_stub_app(service_time: float, workdir: Path):
+    os.environ.setdefault("VITE_SUPABASE_URL", "http://localhost:54321")
+    os.environ.setdefault("VITE_SUPABASE_ANON_KEY", "stub.stub.stub")
+    os.environ.setdefault("GALLERY_DIR", str(workdir / "gallery"))
+    os.environ.setdefault("SIGHTINGS_DIR", str(workdir / "sightings"))
+
+    from backend import main
+
+    reference_path = workdir / "reference.jpg"
+    cv2.imwrite(str(reference_path), np.zeros((8, 8, 3), dtype=np.uint8))
+
+    main.UPLOAD_DIR = workdir / "uploads"
+    main.UPLOAD_DIR.mkdir(exist_ok=True)
+    main.detector = StubDetector(service_time)
+    main.db = StubDatabase(str(reference_path))
+    return main.app
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, int(round(pct / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+async def send(client: httpx.AsyncClient, endpoint: str, payload: bytes, person_id: str) -> int:
+    if endpoint == "video":
+        response = await client.post(
+            "/api/detect/video",
+            data={"missing_person_id": person_id},
+            files={"video": ("load.mp4", payload, "video/mp4")}
+        )
+    else:
+        response = await client.post(
+            "/api/detect/images",
+            data={"missing_person_id": person_id},
+            files=[("images", ("load.jpg", payload, "image/jpeg"))]
+        )
+    return response.status_code
+
+async def admission_stats(client: httpx.AsyncClient, endpoint: str) -> Dict:
+    response = await client.get("/api/admission")
+    return response.json()["data"].get(endpoint, {})
+
+async def run_level(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    payload: bytes,
+    person_id: str,
+    concurrency: int,
+    requests: int,
+    poll_interval: float = 0.05
+) -> Dict:
+    latencies = []
+    statuses: Dict[int, int] = {}
+    remaining = iter(range(requests))
+    peak_queued = 0
+
+    async def worker():
+        for _ in remaining:
+            start_time = time.perf_counter()
+            try:
+                status = await send(client, endpoint, payload, person_id)
+            except httpx.HTTPError:
+                status = 0
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(time.perf_counter() - start_time)
+
+    async def monitor():
+        nonlocal peak_queued
+        while True:
+            stats = await admission_stats(client, endpoint)
+            peak_queued = max(peak_queued, stats.get("queued", 0))
+            await asyncio.sleep(poll_interval)
+
+    before = await admission_stats(client, endpoint)
+    start_time = time.perf_counter()
+    monitor_task = asyncio.create_task(monitor())
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start_time
+    monitor_task.cancel()
+    await asyncio.gather(monitor_task, return_exceptions=True)
+    after = await admission_stats(client, endpoint)
+
+    admitted = after.get("admitted", 0) - before.get("admitted", 0)
+    total_wait = after.get("total_wait_seconds", 0.0) - before.get("total_wait_seconds", 0.0)
+
+    return {
+        "concurrency": concurrency,
+        "ok": statuses.get(200, 0),
+        "rejected": statuses.get(429, 0),
+        "errors": requests - statuses.get(200, 0) - statuses.get(429, 0),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "throughput_rps": statuses.get(200, 0) / elapsed if elapsed > 0 else 0.0,
+        "peak_queued": peak_queued,
+        "avg_wait_ms": total_wait / admitted * 1000 if admitted else 0.0
+    }
+
+async def run(args):
+    payload = cv2.imencode(".jpg", np.zeros((64, 64, 3), dtype=np.uint8))[1].tobytes()
+    if args.endpoint == "video":
+        payload = b"\0" * args.payload_kb * 1024
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, timeout=None)
+        else:
+            app = build_stub_app(args.service_time, Path(workdir))
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=None)
+
+        async with client:
+            print(f"endpoint={args.endpoint} requests/level={args.requests}")
+            for concurrency in args.concurrency:
+                result = await run_level(client, args.endpoint, payload, args.person_id, concurrency, args.requests)
+                print("  ".join(
+                    f"{key}={value:.1f}" if isinstance(value, float) else f"{key}={value}"
+                    for key, value in result.items()
+                ))
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the detection API at increasing concurrency levels")
+    parser.add_argument("--url", help="base URL of a running server (default: in-process app with a stub detector)")
+    parser.add_argument("--endpoint", choices=["video", "images"], default="video")
+    parser.add_argument("--person-id", default=STUB_PERSON_ID, help="missing person to search for (required with --url)")
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--requests", type=int, default=64, help="requests per concurrency level")
+    parser.add_argument("--service-time", type=float, default=0.2, help="stub detector seconds per request")
+    parser.add_argument("--payload-kb", type=int, default=256, help="upload size for video requests")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -6,18 +6,65 @@ import cv2
 import numpy as np
 from pathlib import Path
 import os
-from typing import Optional, List
+import asyncio
+from typing import Optional, List, Dict, Tuple
 import uuid
 from datetime import datetime
 import base64
+import io
+import zipfile
 
-from backend.detection import FaceDetector
+from backend.detection import FaceDetector, DetectorCascade
 from backend.database import Database
+from backend.gallery import GallerySnapshot
+from backend.sightings import SightingIndex
+from backend.admission import AdmissionController, AdmissionMiddleware
 
 app = FastAPI(title="Missing Person Detection API")
 
 app.mount("/static", StaticFiles(directory="public"), name="static")
 
+UPLOAD_DIR = Path("uploads")
+OUTPUT_DIR = Path("outputs")
+UPLOAD_DIR.mkdir(exist_ok=True)
+OUTPUT_DIR.mkdir(exist_ok=True)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+BATCH_SIZE = int(os.getenv("DETECTION_BATCH_SIZE", "8"))
+BATCH_WORKERS = int(os.getenv("DETECTION_BATCH_WORKERS", "4"))
+GALLERY_DIR = Path(os.getenv("GALLERY_DIR", "gallery"))
+VIDEO_SEGMENTS = int(os.getenv("VIDEO_SEGMENTS", "1"))
+CASCADE_FAST_BACKEND = os.getenv("CASCADE_FAST_BACKEND")
+EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "float32")
+SIGHTINGS_DIR = os.getenv("SIGHTINGS_DIR", "sightings")
+SIGHTINGS_MAX_SEGMENTS = int(os.getenv("SIGHTINGS_MAX_SEGMENTS", "32"))
+ARCHIVE_MAX_ENTRIES = int(os.getenv("ARCHIVE_MAX_ENTRIES", "1000"))
+ARCHIVE_MAX_BYTES = int(os.getenv("ARCHIVE_MAX_BYTES", str(500 * 1024 * 1024)))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+
+admission = {
+    name: AdmissionController(
+        name,
+        max_concurrent=int(os.getenv(f"ADMISSION_{name.upper()}_CONCURRENCY", str(concurrency))),
+        max_queue=int(os.getenv(f"ADMISSION_{name.upper()}_QUEUE", str(queue))),
+        queue_timeout=ADMISSION_QUEUE_TIMEOUT
+    )
+    for name, concurrency, queue in (
+        ("video", 2, 8),
+        ("images", 2, 8),
+        ("register", 4, 16)
+    )
+}
+
+app.add_middleware(
+    AdmissionMiddleware,
+    routes={
+        ("POST", "/api/detect/video"): admission["video"],
+        ("POST", "/api/detect/images"): admission["images"],
+        ("POST", "/api/missing-persons"): admission["register"]
+    }
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -26,13 +73,93 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-UPLOAD_DIR = Path("uploads")
-OUTPUT_DIR = Path("outputs")
-UPLOAD_DIR.mkdir(exist_ok=True)
-OUTPUT_DIR.mkdir(exist_ok=True)
+cascade = None
+if CASCADE_FAST_BACKEND:
+    cascade = DetectorCascade(
+        fast_backend=CASCADE_FAST_BACKEND,
+        fast_scale=float(os.getenv("CASCADE_FAST_SCALE", "0.25")),
+        refine_backend=os.getenv("CASCADE_REFINE_BACKEND", "retinaface") or None,
+        roi_margin=float(os.getenv("CASCADE_ROI_MARGIN", "0.5"))
+    )
 
-detector = FaceDetector()
+sighting_index = None
+if SIGHTINGS_DIR:
+    sighting_index = SightingIndex(Path(SIGHTINGS_DIR), dtype=EMBEDDING_DTYPE, max_segments=SIGHTINGS_MAX_SEGMENTS)
+detector = FaceDetector(cascade=cascade, embedding_dtype=EMBEDDING_DTYPE, sighting_index=sighting_index)
 db = Database()
+gallery = GallerySnapshot(GALLERY_DIR, dtype=EMBEDDING_DTYPE)
+
+reference_embeddings: Dict[Tuple[str, str], np.ndarray] = {}
+
+async def get_reference_embedding(person: Dict) -> Optional[np.ndarray]:
+    key = (person["id"], person["reference_image_url"])
+    if key not in reference_embeddings:
+        ref_image = await asyncio.to_thread(cv2.imread, person["reference_image_url"])
+        if ref_image is None:
+            return None
+        embedding = await asyncio.to_thread(detector.get_face_embedding, ref_image)
+        if embedding is None:
+            return None
+        reference_embeddings[key] = embedding
+    return reference_embeddings[key]
+
+async def load_gallery_entries() -> List[Dict]:
+    entries = []
+    for person in await db.get_missing_persons("active"):
+        embedding = await get_reference_embedding(person)
+        if embedding is not None:
+            entries.append({"id": person["id"], "name": person["name"], "embedding": embedding})
+    return entries
+
+async def record_retroactive_matches(person_id: str, embedding: np.ndarray, threshold: float = 0.7) -> List[Dict]:
+    if sighting_index is None:
+        return []
+
+    sightings = await asyncio.to_thread(sighting_index.search, embedding, threshold, best_per_video=True)
+
+    matches = []
+    for sighting in sightings:
+        detection_id = await db.create_detection(
+            missing_person_id=person_id,
+            detection_type="video",
+            confidence_score=sighting["confidence"],
+            video_url=sighting["video_path"],
+            location_info={
+                "retroactive": True,
+                "frame_number": sighting["frame_number"],
+                "timestamp": sighting["timestamp"],
+                "bbox": sighting["bbox"]
+            }
+        )
+        matches.append({"detection_id": detection_id, **sighting})
+    return matches
+
+def extract_archive_images(archive_data: bytes) -> List[Tuple[str, bytes]]:
+    with zipfile.ZipFile(io.BytesIO(archive_data)) as archive:
+        entries = [
+            info for info in archive.infolist()
+            if not info.is_dir() and Path(info.filename).suffix.lower() in IMAGE_EXTENSIONS
+        ]
+        if len(entries) > ARCHIVE_MAX_ENTRIES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Archive contains {len(entries)} images, the limit is {ARCHIVE_MAX_ENTRIES}"
+            )
+        total_size = sum(info.file_size for info in entries)
+        if total_size > ARCHIVE_MAX_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Archive expands to {total_size} bytes, the limit is {ARCHIVE_MAX_BYTES}"
+            )
+        return [(info.filename, archive.read(info)) for info in entries]
+
+@app.on_event("startup")
+async def open_gallery():
+    await gallery.ensure(load_gallery_entries)
+
+@app.on_event("shutdown")
+async def close_detector():
+    await asyncio.to_thread(detector.close)
 
 @app.get("/", response_class=HTMLResponse)
 async def root():
@@ -80,17 +207,50 @@ async def create_missing_person(
             reference_image_url=str(image_path)
         )
 
+        embedding = await asyncio.to_thread(detector.get_face_embedding, image)
+        retroactive_matches = []
+        if embedding is not None:
+            reference_embeddings[(person_id, str(image_path))] = embedding
+            await asyncio.to_thread(gallery.upsert, person_id, name, embedding)
+            retroactive_matches = await record_retroactive_matches(person_id, embedding)
+
         return {
             "success": True,
             "data": {
                 "id": person_id,
                 "name": name,
-                "reference_image_url": str(image_path)
+                "reference_image_url": str(image_path),
+                "retroactive_matches": retroactive_matches
             }
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.put("/api/missing-persons/{person_id}/status")
+async def update_missing_person_status(person_id: str, status: str = Form(...)):
+    try:
+        if status not in ("active", "found", "inactive"):
+            raise HTTPException(status_code=400, detail="Invalid status")
+
+        person = await db.get_missing_person_by_id(person_id)
+        if not person:
+            raise HTTPException(status_code=404, detail="Missing person not found")
+
+        await db.update_missing_person_status(person_id, status)
+
+        if status == "active":
+            embedding = await get_reference_embedding(person)
+            if embedding is not None:
+                await asyncio.to_thread(gallery.upsert, person_id, person["name"], embedding)
+        else:
+            await asyncio.to_thread(gallery.remove, person_id)
+
+        return {"success": True, "data": {"id": person_id, "status": status}}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/detect/video")
 async def detect_in_video(
     missing_person_id: str = Form(...),
@@ -112,10 +272,14 @@ async def detect_in_video(
         if ref_image is None:
             raise HTTPException(status_code=400, detail="Reference image not found")
 
+        gallery.refresh()
+
         result = await detector.detect_in_video(
             reference_image=ref_image,
             video_path=str(video_path),
-            person_name=person["name"]
+            person_name=person["name"],
+            segments=VIDEO_SEGMENTS,
+            ref_embedding=gallery.get(missing_person_id)
         )
 
         if result["detected"]:
@@ -134,19 +298,91 @@ async def detect_in_video(
                     "detection_id": detection_id,
                     "confidence": result["confidence"],
                     "frame_url": result["frame_path"],
-                    "video_url": result["output_video_path"]
+                    "video_url": result["output_video_path"],
+                    "stage_costs": result["stage_costs"]
                 }
             }
         else:
             return {
                 "success": True,
                 "detected": False,
-                "message": "Person not found in video"
+                "message": "Person not found in video",
+                "data": {"stage_costs": result.get("stage_costs")}
             }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/detect/images")
+async def detect_in_images(
+    missing_person_id: Optional[str] = Form(None),
+    threshold: float = Form(0.7),
+    images: List[UploadFile] = File(None),
+    archive: Optional[UploadFile] = File(None)
+):
+    try:
+        gallery.refresh()
+        state = gallery.state
+
+        if missing_person_id:
+            embedding = state.get(missing_person_id)
+            if embedding is not None:
+                search_gallery = {missing_person_id: embedding}
+                names = {missing_person_id: state.get_name(missing_person_id)}
+            else:
+                person = await db.get_missing_person_by_id(missing_person_id)
+                if not person:
+                    raise HTTPException(status_code=404, detail="Missing person not found")
+                embedding = await get_reference_embedding(person)
+                search_gallery = {missing_person_id: embedding} if embedding is not None else {}
+                names = {missing_person_id: person["name"]}
+        else:
+            search_gallery = state.embeddings
+            names = dict(zip(state.ids, state.names))
+
+        if not search_gallery:
+            raise HTTPException(status_code=400, detail="No usable reference images")
+
+        image_items = []
+        for image in images or []:
+            image_items.append((image.filename, await image.read()))
+        if archive is not None:
+            try:
+                image_items.extend(await asyncio.to_thread(extract_archive_images, await archive.read()))
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail="Invalid archive file")
+
+        if not image_items:
+            raise HTTPException(status_code=400, detail="No images provided")
+
+        result = await detector.detect_in_images(
+            gallery=search_gallery,
+            images=image_items,
+            threshold=threshold,
+            batch_size=BATCH_SIZE,
+            max_workers=BATCH_WORKERS
+        )
+
+        for image_result in result["results"]:
+            for match in image_result.get("matches", []):
+                match["name"] = names[match["missing_person_id"]]
+
+        return {
+            "success": True,
+            "detected": result["detected"],
+            "data": {
+                "total_images": result["total_images"],
+                "elapsed_seconds": result["elapsed_seconds"],
+                "images_per_second": result["images_per_second"],
+                "results": result["results"]
+            }
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/detections/{missing_person_id}")
 async def get_detections(missing_person_id: str):
     try:
@@ -162,6 +398,10 @@ async def get_file(file_path: str):
         return FileResponse(full_path)
     raise HTTPException(status_code=404, detail="File not found")
 
+@app.get("/api/admission")
+async def admission_stats():
+    return {"success": True, "data": {name: controller.stats() for name, controller in admission.items()}}
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
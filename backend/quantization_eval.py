@@ -0,0 +1,84 @@
+import argparse
+import time
+import numpy as np
+from pathlib import Path
+
+from backend.embeddings import EMBEDDING_DTYPES, EmbeddingMatrix, normalize
+
+def load_image_embeddings(image_dir: Path) -> np.ndarray:
+    import cv2
+    from backend.detection import FaceDetector
+
+    detector = FaceDetector()
+    embeddings = []
+    for path in sorted(image_dir.iterdir()):
+        image = cv2.imread(str(path))
+        if image is None:
+            continue
+        embedding = detector.get_face_embedding(image)
+        if embedding is not None:
+            embeddings.append(embedding)
+    return np.vstack(embeddings)
+
+def evaluate(gallery: np.ndarray, queries: np.ndarray, k: int = 10, threshold: float = 0.7):
+    k = min(k, len(gallery))
+    reference = EmbeddingMatrix.quantize(gallery, "float32")
+    reference_scores = np.vstack([reference.similarities(query) for query in queries])
+    reference_top = np.argsort(-reference_scores, axis=1)[:, :k]
+
+    results = []
+    for dtype in EMBEDDING_DTYPES:
+        matrix = EmbeddingMatrix.quantize(gallery, dtype)
+
+        start_time = time.perf_counter()
+        scores = np.vstack([matrix.similarities(query) for query in queries])
+        elapsed = time.perf_counter() - start_time
+
+        top = np.argsort(-scores, axis=1)[:, :k]
+        recall = np.mean([
+            len(set(found) & set(expected)) / k
+            for found, expected in zip(top, reference_top)
+        ])
+
+        results.append({
+            "dtype": dtype,
+            "bytes": matrix.nbytes,
+            "compression": reference.nbytes / matrix.nbytes,
+            "ms_per_query": elapsed / len(queries) * 1000,
+            f"recall@{k}": float(recall),
+            "threshold_agreement": float(np.mean((scores > threshold) == (reference_scores > threshold))),
+            "max_abs_error": float(np.max(np.abs(scores - reference_scores)))
+        })
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare quantized embedding matching against float32")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--embeddings", type=Path, help=".npy file with an N x D gallery matrix")
+    source.add_argument("--images", type=Path, help="directory of face images to embed")
+    parser.add_argument("--queries", type=Path, help=".npy file with query embeddings (default: noisy gallery copies)")
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    gallery = np.load(args.embeddings) if args.embeddings else load_image_embeddings(args.images)
+    gallery = normalize(gallery)
+
+    if args.queries:
+        queries = normalize(np.load(args.queries))
+    else:
+        rng = np.random.default_rng(args.seed)
+        queries = normalize(gallery + rng.normal(0, args.noise, gallery.shape).astype(np.float32))
+
+    print(f"gallery: {gallery.shape[0]} x {gallery.shape[1]}, queries: {len(queries)}")
+    for result in evaluate(gallery, queries, args.k, args.threshold):
+        print("  ".join(
+            f"{key}={value:.4f}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in result.items()
+        ))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import json
+import uuid
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from backend.embeddings import EmbeddingMatrix
+from backend.gallery import file_lock, write_array
+
+class SightingIndex:
+    def __init__(self, root: Path = Path("sightings"), dtype: str = "float32", max_segments: int = 32):
+        self.root = Path(root)
+        self.root.mkdir(exist_ok=True)
+        self.dtype = dtype
+        self.max_segments = max_segments
+        self.lock_file = self.root / "LOCK"
+        self._open_segments: Dict[int, Tuple[EmbeddingMatrix, List[Dict]]] = {}
+
+    def _paths(self, seq: int):
+        return (
+            self.root / f"segment-{seq:08d}.npy",
+            self.root / f"segment-{seq:08d}.scales.npy",
+            self.root / f"segment-{seq:08d}.json"
+        )
+
+    def segments(self) -> List[int]:
+        return sorted(int(path.name[8:16]) for path in self.root.glob("segment-????????.npy"))
+
+    def _open(self, seq: int) -> Tuple[EmbeddingMatrix, List[Dict]]:
+        if seq not in self._open_segments:
+            embeddings_path, scales_path, records_path = self._paths(seq)
+            meta = json.loads(records_path.read_text())
+            codes = np.load(embeddings_path, mmap_mode="r")
+            scales = np.load(scales_path, mmap_mode="r") if meta["dtype"] == "int8" else None
+            self._open_segments[seq] = (EmbeddingMatrix(codes, scales), meta["records"])
+        return self._open_segments[seq]
+
+    def _write_segment(self, seq: int, records: List[Dict], embeddings: np.ndarray):
+        embeddings_path, scales_path, records_path = self._paths(seq)
+        tmp_suffix = f".tmp-{uuid.uuid4().hex}"
+
+        matrix = EmbeddingMatrix.quantize(embeddings, self.dtype)
+
+        tmp_records = records_path.with_name(records_path.name + tmp_suffix)
+        tmp_records.write_text(json.dumps({"dtype": self.dtype, "records": records}))
+        tmp_records.replace(records_path)
+
+        if matrix.scales is not None:
+            write_array(scales_path, matrix.scales, tmp_suffix)
+        write_array(embeddings_path, matrix.codes, tmp_suffix)
+
+    def _remove_segment(self, seq: int):
+        self._open_segments.pop(seq, None)
+        for path in self._paths(seq):
+            if path.exists():
+                path.unlink()
+
+    def append(self, video_path: str, fps: float, sightings: List[Dict]) -> Optional[int]:
+        if not sightings:
+            return None
+
+        records = [
+            {
+                "video_path": video_path,
+                "frame_number": sighting["frame_number"],
+                "timestamp": (sighting["frame_number"] - 1) / fps if fps else None,
+                "bbox": sighting["bbox"]
+            }
+            for sighting in sightings
+        ]
+        embeddings = np.vstack([sighting["embedding"] for sighting in sightings])
+
+        with file_lock(self.lock_file):
+            segments = self.segments()
+            seq = segments[-1] + 1 if segments else 1
+            self._write_segment(seq, records, embeddings)
+
+        if len(segments) + 1 > self.max_segments:
+            self.compact()
+
+        return seq
+
+    def compact(self) -> Optional[int]:
+        with file_lock(self.lock_file):
+            segments = self.segments()
+            if len(segments) < 2:
+                return None
+
+            records = []
+            embeddings = []
+            for seq in segments:
+                matrix, segment_records = self._open(seq)
+                records.extend(segment_records)
+                embeddings.append(matrix.dequantize())
+
+            compacted = segments[-1] + 1
+            self._write_segment(compacted, records, np.vstack(embeddings))
+
+            for seq in segments:
+                self._remove_segment(seq)
+
+        return compacted
+
+    def search(
+        self,
+        embedding: np.ndarray,
+        threshold: float = 0.7,
+        limit: int = 100,
+        best_per_video: bool = False
+    ) -> List[Dict]:
+        while True:
+            segments = self.segments()
+            for seq in set(self._open_segments) - set(segments):
+                self._open_segments.pop(seq)
+
+            try:
+                hits = []
+                for seq in segments:
+                    matrix, records = self._open(seq)
+                    scores = matrix.similarities(embedding)
+                    for row in np.flatnonzero(scores > threshold):
+                        hits.append({**records[row], "confidence": float(scores[row])})
+                break
+            except FileNotFoundError:
+                continue
+
+        unique_hits = {}
+        for hit in hits:
+            if best_per_video:
+                key = hit["video_path"]
+            else:
+                key = (hit["video_path"], hit["frame_number"], tuple(hit["bbox"].values()))
+            if key not in unique_hits or hit["confidence"] > unique_hits[key]["confidence"]:
+                unique_hits[key] = hit
+
+        hits = sorted(unique_hits.values(), key=lambda hit: hit["confidence"], reverse=True)
+        return hits[:limit]
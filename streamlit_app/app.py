@@ -1,11 +1,18 @@
 import streamlit as st
 import cv2
-import numpy as np
 from tempfile import NamedTemporaryFile
+from pathlib import Path
+import asyncio
+import hashlib
 import os
-from deepface import DeepFace
+import sys
+import threading
 import time
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.detection import FaceDetector, decode_image
+
 # ============================================================
 #                     PREMIUM UI & STYLE
 # ============================================================
@@ -173,6 +180,64 @@ if theme_mode == "Light Mode":
 # ============================================================
 #                     ORIGINAL APP CODE
 # ============================================================
+@st.cache_resource
+def get_detector():
+    return FaceDetector()
+
+def upload_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+@st.cache_data(show_spinner=False)
+def get_reference_embedding(image_hash: str, _image_bytes: bytes):
+    ref_image = decode_image(_image_bytes)
+    if ref_image is None:
+        return None
+    return get_detector().get_face_embedding(ref_image)
+
+class VideoJob:
+    def __init__(self, video_bytes: bytes, ref_embedding, person_name: str):
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(video_bytes, ref_embedding, person_name),
+            daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def done(self) -> bool:
+        return not self._thread.is_alive()
+
+    def _update_progress(self, frames_done: int, total_frames: int):
+        if total_frames > 0:
+            self.progress = min(frames_done / total_frames, 1.0)
+
+    def _run(self, video_bytes: bytes, ref_embedding, person_name: str):
+        tfile = NamedTemporaryFile(delete=False, suffix=".mp4")
+        tfile.write(video_bytes)
+        tfile.close()
+        try:
+            self.result = asyncio.run(get_detector().detect_in_video(
+                reference_image=None,
+                video_path=tfile.name,
+                person_name=person_name,
+                ref_embedding=ref_embedding,
+                progress_callback=self._update_progress
+            ))
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            os.unlink(tfile.name)
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def get_video_job(result_key: tuple, person_name: str, _video_bytes: bytes, _ref_embedding) -> VideoJob:
+    return VideoJob(_video_bytes, _ref_embedding, person_name)
+
+detector = get_detector()
+poll_video_job = False
+
 st.title("Missing Person Detector")
 tabs = st.tabs(["Video Detection", "Live Webcam Detection"])
 
@@ -192,82 +257,40 @@ with tabs[0]:
     )
 
     if uploaded_images and uploaded_video:
-        st.info("Processing video, please wait...")
         img_file = uploaded_images[0]
-        file_bytes = np.frombuffer(img_file.read(), np.uint8)
-        ref_image = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
-        ref_embedding = DeepFace.represent(img_path=ref_image, model_name="Facenet", enforce_detection=True)[0]["embedding"]
+        image_bytes = img_file.getvalue()
+        video_bytes = uploaded_video.getvalue()
+        image_hash = upload_hash(image_bytes)
+        result_key = (image_hash, upload_hash(video_bytes))
         person_name = img_file.name.split(".")[0]
 
-        tfile = NamedTemporaryFile(delete=False, suffix=".mp4")
-        tfile.write(uploaded_video.read())
-        tfile_path = tfile.name
-
-        video_capture = cv2.VideoCapture(tfile_path)
-        fps = int(video_capture.get(cv2.CAP_PROP_FPS))
-        width = int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
-
-        output_path = os.path.join(os.getcwd(), "output_video_fast.mp4")
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out_video = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-
-        detected = False
-        detected_face_img = None
-        detected_frame = None
-        frame_skip = 5
-        current_frame = 0
-        progress_bar = st.progress(0)
-
-        while True:
-            ret, frame = video_capture.read()
-            if not ret:
-                break
-            current_frame += 1
-            progress_bar.progress(current_frame / int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT)))
-            if current_frame % frame_skip != 0 and not detected:
-                out_video.write(frame)
-                continue
-            if not detected:
-                small_frame = cv2.resize(frame, (0,0), fx=0.5, fy=0.5)
-                try: results = DeepFace.extract_faces(img_path=small_frame, enforce_detection=False)
-                except: results = []
-                best_similarity = 0
-                best_face = None
-                x, y, w, h = 0, 0, 0, 0
-                for face in results:
-                    fx = int(face["facial_area"]["x"] * 2)
-                    fy = int(face["facial_area"]["y"] * 2)
-                    fw = int(face["facial_area"]["w"] * 2)
-                    fh = int(face["facial_area"]["h"] * 2)
-                    face_img = frame[fy:fy+fh, fx:fx+fw]
-                    embedding = DeepFace.represent(img_path=face_img, model_name="Facenet", enforce_detection=False)[0]["embedding"]
-                    cos_sim = np.dot(ref_embedding, embedding) / (np.linalg.norm(ref_embedding) * np.linalg.norm(embedding))
-                    if cos_sim > best_similarity:
-                        best_similarity = cos_sim
-                        best_face = face_img
-                        x, y, w, h = fx, fy, fw, fh
-                if best_similarity > 0.7:
-                    detected = True
-                    detected_face_img = best_face
-                    detected_frame = frame.copy()
-                    cv2.rectangle(detected_frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-                    cv2.putText(detected_frame, person_name, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-            out_video.write(detected_frame if detected else frame)
-
-        if detected_frame is not None:
-            for _ in range(fps * 3):
-                out_video.write(detected_frame)
-        video_capture.release()
-        out_video.release()
-
-        if detected:
+        ref_embedding = get_reference_embedding(image_hash, image_bytes)
+        if ref_embedding is None:
+            st.error("Could not extract face from reference image")
+            st.stop()
+
+        job = get_video_job(result_key, person_name, video_bytes, ref_embedding)
+        result = job.result
+
+        if not job.done:
+            st.info("Processing video, please wait...")
+            st.progress(job.progress)
+            poll_video_job = True
+        elif job.error is not None:
+            st.error(f"Video processing failed: {job.error}")
+            if st.button("Retry"):
+                get_video_job.clear()
+                st.rerun()
+        elif result["detected"]:
             st.success(f"{person_name} found in video!")
-            st.image(detected_face_img, caption=f"{person_name} detected!", use_column_width=True)
+            st.image(result["frame_path"], caption=f"{person_name} detected!", use_column_width=True)
         else:
             st.warning("Person not found in video!")
-        st.video(output_path)
-        st.download_button("Download Processed Video", data=open(output_path, "rb"), file_name="output_video_fast.mp4")
+
+        if job.done and result is not None:
+            st.video(result["output_video_path"])
+            with open(result["output_video_path"], "rb") as output_file:
+                st.download_button("Download Processed Video", data=output_file, file_name="output_video_fast.mp4")
 
 # -------------------- Feature 2: Live Webcam Detection --------------------
 with tabs[1]:
@@ -278,52 +301,33 @@ with tabs[1]:
         key="webcam_ref"
     )
     if webcam_ref_image:
-        file_bytes = np.frombuffer(webcam_ref_image.read(), np.uint8)
-        webcam_ref = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
-        webcam_ref_embedding = DeepFace.represent(img_path=webcam_ref, model_name="Facenet", enforce_detection=True)[0]["embedding"]
+        image_bytes = webcam_ref_image.getvalue()
+        webcam_ref_embedding = get_reference_embedding(upload_hash(image_bytes), image_bytes)
         webcam_person_name = webcam_ref_image.name.split(".")[0]
+        if webcam_ref_embedding is None:
+            st.error("Could not extract face from reference image")
+            st.stop()
         st.info("Starting webcam... (close webcam window to stop)")
         cap = cv2.VideoCapture(0)
         webcam_placeholder = st.empty()
-        detected_webcam_face = None
-        detected_webcam_frame = None
-        detected_webcam = False
+        match = None
         frame_skip = 2
         frame_count = 0
         while cap.isOpened():
             ret, frame = cap.read()
             if not ret: break
             frame_count += 1
-            if frame_count % frame_skip == 0 and not detected_webcam:
-                small_frame = cv2.resize(frame, (0,0), fx=0.5, fy=0.5)
-                try: results = DeepFace.extract_faces(img_path=small_frame, enforce_detection=False)
-                except: results = []
-                best_similarity = 0
-                for face in results:
-                    fx = int(face["facial_area"]["x"] / 0.5)
-                    fy = int(face["facial_area"]["y"] / 0.5)
-                    fw = int(face["facial_area"]["w"] / 0.5)
-                    fh = int(face["facial_area"]["h"] / 0.5)
-                    face_img = frame[fy:fy+fh, fx:fx+fw]
-                    embedding = DeepFace.represent(img_path=face_img, model_name="Facenet", enforce_detection=False)[0]["embedding"]
-                    cos_sim = np.dot(webcam_ref_embedding, embedding) / (np.linalg.norm(webcam_ref_embedding) * np.linalg.norm(embedding))
-                    if cos_sim > best_similarity:
-                        best_similarity = cos_sim
-                        detected_webcam_face = face_img
-                        detected_webcam_frame = frame.copy()
-                        x, y, w, h = fx, fy, fw, fh
-                if best_similarity > 0.7:
-                    detected_webcam = True
-                    cv2.rectangle(detected_webcam_frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-                    cv2.putText(detected_webcam_frame, webcam_person_name, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+            if frame_count % frame_skip == 0 and match is None:
+                match = detector.scan_frame(frame, webcam_ref_embedding, webcam_person_name, 0.7, frame_count)
+                if match is not None:
                     for _ in range(30):
-                        webcam_placeholder.image(cv2.cvtColor(detected_webcam_frame, cv2.COLOR_BGR2RGB))
+                        webcam_placeholder.image(cv2.cvtColor(match["detected_frame"], cv2.COLOR_BGR2RGB))
                         time.sleep(0.1)
-            webcam_placeholder.image(cv2.cvtColor(detected_webcam_frame if detected_webcam else frame, cv2.COLOR_BGR2RGB))
+            webcam_placeholder.image(cv2.cvtColor(match["detected_frame"] if match else frame, cv2.COLOR_BGR2RGB))
         cap.release()
-        if detected_webcam:
+        if match is not None:
             st.success(f"{webcam_person_name} detected in webcam!")
-            st.image(detected_webcam_face, caption=f"{webcam_person_name} detected!", use_column_width=True)
+            st.image(match["detected_face_img"], channels="BGR", caption=f"{webcam_person_name} detected!", use_column_width=True)
         else:
             st.warning(f"{webcam_person_name} not detected in webcam.")
 
@@ -341,3 +345,7 @@ st.markdown("""
     <p style='font-size:13px; color:#7ac7ff;'>© 2025 All Rights Reserved</p>
 </div>
 """, unsafe_allow_html=True)
+
+if poll_video_job:
+    time.sleep(0.5)
+    st.rerun()